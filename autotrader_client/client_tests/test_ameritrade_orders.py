@@ -4,6 +4,8 @@ import logging
 import datetime
 import math
 import copy
+import os
+import orjson
 import tda
 import src.ameritrade_orders as am
 
@@ -156,6 +158,13 @@ POSITIONS = {
 }
 
 
+@pytest.fixture(autouse=True)
+def clear_client_cache():
+    """Each test should authenticate with its own mocked client and positions"""
+    am.authenticate_tda_account.cache_clear()
+    am._positions_cache.clear()
+
+
 def test_initialize_order_bto(monkeypatch):
     """Validated BTO order should lead to process BTO order function"""
 
@@ -200,6 +209,141 @@ def test_initialize_order_other(monkeypatch, caplog):
     assert logged.split()[-1] == "ABC"
 
 
+@pytest.fixture
+def tmp_config(monkeypatch, tmp_path):
+    """Point the TDA auth and order settings paths at temporary config files"""
+    auth_path = tmp_path / "tda_auth_params.json"
+    auth_path.write_text(
+        '{"tda_api_key": "key", "tda_auth_uri": "uri", "tda_acct": "1234567890"}'
+    )
+    settings_path = tmp_path / "order_guidelines.json"
+    settings_path.write_text(
+        '{"max_order_value": 1000.00, "high_risk_order_value": 500.00,'
+        ' "buy_limit_percent": 0.05, "SL_percentage": 0.10}'
+    )
+    monkeypatch.setattr(am, "TD_AUTH_PARAMS_PATH", str(auth_path))
+    monkeypatch.setattr(am, "ORD_SETTINGS_PATH", str(settings_path))
+
+
+def test_get_client_cached(monkeypatch, tmp_config):
+    """Client should only be authenticated once across orders"""
+    calls = []
+
+    def mock_client_from_token_file(token_path, api_key):
+        calls.append(token_path)
+        return tda.client.Client
+
+    monkeypatch.setattr(tda.auth, "client_from_token_file", mock_client_from_token_file)
+    first, td_acct, usr_set = am.get_client()
+    assert am.get_client()[0] is first
+    assert len(calls) == 1
+    assert td_acct["acct_num"] == "1234567890"
+    assert usr_set["max_ord_val"] == 1000.00
+
+
+def test_load_config_reloads_modified_file(tmp_path):
+    """Config file should be cached until it is modified"""
+    path = tmp_path / "config.json"
+    path.write_text('{"max_order_value": 1000.00}')
+    first = am.load_config(str(path))
+    assert am.load_config(str(path)) is first
+
+    path.write_text('{"max_order_value": 500.00}')
+    os.utime(path, ns=(0, 0))  # mtime resolution may hide a fast rewrite
+    assert am.load_config(str(path)) == {"max_order_value": 500.00}
+
+
+def test_build_option_symbol():
+    """Option symbol should be built from order parameters"""
+    assert am.build_option_symbol(VALID_ORD_INPUT) == "SPY_030321P380"
+    assert am.build_option_symbol(VALID_ORD_INPUT) == "SPY_030321P380"
+    assert am._build_option_symbol.cache_info().hits >= 1
+
+
+def test_check_auth_unauthorized(monkeypatch):
+    """Unauthorized response should clear the cached client and raise"""
+    cleared = []
+
+    class MockResponse:
+        status_code = 401
+
+    monkeypatch.setattr(
+        am.authenticate_tda_account, "cache_clear", lambda: cleared.append(True)
+    )
+    with pytest.raises(am.AuthenticationExpired):
+        am.check_auth(MockResponse)
+    assert cleared == [True]
+
+    cleared.clear()
+    MockResponse.status_code = 200
+    assert am.check_auth(MockResponse) is MockResponse
+    assert cleared == []
+
+
+class UnauthorizedResponse:
+    status_code = 401
+    content = orjson.dumps({"error": "Not Authorized"})
+
+
+def test_get_position_quant_unauthorized(monkeypatch):
+    """Unauthorized account query should clear the cached client and raise"""
+
+    def mock_client_from_token_file(token_path, api_key):
+        return tda.client.Client
+
+    def mock_get_account(acct_id, fields):
+        return UnauthorizedResponse
+
+    monkeypatch.setattr(tda.auth, "client_from_token_file", mock_client_from_token_file)
+    client = am.authenticate_tda_account("path.json", "key", "uri")
+    assert am.authenticate_tda_account.cache_info().currsize == 1
+
+    monkeypatch.setattr(client, "get_account", mock_get_account)
+    with pytest.raises(am.AuthenticationExpired):
+        am.get_position_quant(client, "1234567890", "SPY_030321P380")
+    assert am.authenticate_tda_account.cache_info().currsize == 0
+
+
+def test_get_existing_stc_orders_unauthorized(monkeypatch):
+    """Unauthorized order query should clear the cached client and raise"""
+
+    def mock_client_from_token_file(token_path, api_key):
+        return tda.client.Client
+
+    def mock_get_orders_by_query(from_entered_datetime, status):
+        return UnauthorizedResponse
+
+    monkeypatch.setattr(tda.auth, "client_from_token_file", mock_client_from_token_file)
+    client = am.authenticate_tda_account("path.json", "key", "uri")
+
+    monkeypatch.setattr(client, "get_orders_by_query", mock_get_orders_by_query)
+    with pytest.raises(am.AuthenticationExpired):
+        am.get_existing_stc_orders(client, "TSLA_030521P520")
+    assert am.authenticate_tda_account.cache_info().currsize == 0
+
+
+def test_initialize_order_unauthorized(monkeypatch, tmp_config, caplog):
+    """Expired authentication should skip the order with a warning, and the next
+    order should re-authenticate"""
+    caplog.set_level(logging.WARNING)
+    calls = []
+
+    def mock_client_from_token_file(token_path, api_key):
+        calls.append(token_path)
+        return tda.client.Client
+
+    def mock_get_account(acct_id, fields):
+        return UnauthorizedResponse
+
+    monkeypatch.setattr(tda.auth, "client_from_token_file", mock_client_from_token_file)
+    monkeypatch.setattr(tda.client.Client, "get_account", mock_get_account)
+    am.initialize_order(VALID_ORD_INPUT)
+    assert "authentication expired" in caplog.text
+
+    am.get_client()
+    assert len(calls) == 2
+
+
 def test_authenticate_tda_account_token(monkeypatch):
     """Testing authentication flow with valid token"""
 
@@ -353,6 +497,15 @@ def test_calc_buy_order_quantity():
     assert am.calc_buy_order_quantity(price=1, ord_val=100, limit_percent=0.1) == 0
 
 
+def test_calc_buy_order_quantity_precomputed():
+    """Should match quantity calculated from limit percent"""
+    for limit_percent in [0, 0.03, 0.1, 0.25]:
+        factor = 1 + limit_percent
+        assert am.calc_buy_order_quantity_precomputed(
+            1.5, 2000, factor
+        ) == am.calc_buy_order_quantity(1.5, 2000, limit_percent)
+
+
 def test_calc_buy_limit_price():
     """Buy limit is correctly calculated """
     contract_price_buy_lim_per = [
@@ -364,6 +517,14 @@ def test_calc_buy_limit_price():
         assert math.isclose(am.calc_buy_limit_price(tup[0], tup[1]), tup[2])
 
 
+def test_calc_buy_limit_price_precomputed():
+    """Should match limit price calculated from limit percent"""
+    for limit_percent in [0, 0.03, 0.1, 0.25]:
+        assert am.calc_buy_limit_price_precomputed(
+            1.5, 1 + limit_percent
+        ) == am.calc_buy_limit_price(1.5, limit_percent)
+
+
 def test_calc_sl_percentage():
     """SL percentage is correctly calculated """
     contract_price_sl_price = [
@@ -546,9 +707,7 @@ def test_get_position_quant(monkeypatch):
     """Returns long position or None if no long position"""
     # mock call to API and returned object
     class MockResponse:
-        @staticmethod
-        def json():
-            return POSITIONS
+        content = orjson.dumps(POSITIONS)
 
     def mock_get_account(acct_id, fields):
         return MockResponse
@@ -565,6 +724,95 @@ def test_get_position_quant(monkeypatch):
     assert am.get_position_quant(client, acct_num, non_existent_symbol) is None
 
 
+def test_get_position_quant_cached(monkeypatch):
+    """Account positions should only be requested once within the ttl"""
+    calls = []
+
+    class MockResponse:
+        content = orjson.dumps(POSITIONS)
+
+    def mock_get_account(acct_id, fields):
+        calls.append(acct_id)
+        return MockResponse
+
+    client = tda.client.Client
+    monkeypatch.setattr(client, "get_account", mock_get_account)
+    acct_num = "1234567890"
+
+    am.get_position_quant(client, acct_num, "SPY_030321P380")
+    am.get_position_quant(client, acct_num, "AAPL_030321C20")
+    assert len(calls) == 1
+
+    am.get_position_quant(client, acct_num, "SPY_030321P380", ttl=0)
+    assert len(calls) == 2
+
+
+def test_process_stc_order_clears_positions_cache(monkeypatch):
+    """Back-to-back reduce and full STC orders should each query positions"""
+    client = tda.client.Client
+    acct_num = "1234567890"
+    calls = []
+
+    class MockResponse:
+        content = orjson.dumps(POSITIONS)
+
+    def mock_get_account(acct_id, fields):
+        calls.append(acct_id)
+        return MockResponse
+
+    def mock_get_existing_stc_orders(client, option_symbol):
+        return []
+
+    def mock_place_order(acct_num, order_spec):
+        return "PASAR"
+
+    monkeypatch.setattr(client, "get_account", mock_get_account)
+    monkeypatch.setattr(am, "get_existing_stc_orders", mock_get_existing_stc_orders)
+    monkeypatch.setattr(client, "place_order", mock_place_order)
+
+    reduce_flags = {"SL": None, "risk_level": None, "reduce": 0.5}
+    monkeypatch.setitem(VALID_ORD_INPUT, "flags", reduce_flags)
+    am.process_stc_order(client, acct_num, VALID_ORD_INPUT, USR_SET)
+
+    close_flags = {"SL": None, "risk_level": None, "reduce": None}
+    monkeypatch.setitem(VALID_ORD_INPUT, "flags", close_flags)
+    am.process_stc_order(client, acct_num, VALID_ORD_INPUT, USR_SET)
+    assert len(calls) == 2
+
+
+def test_process_bto_order_clears_positions_cache(monkeypatch):
+    """An STC order right after a BTO order should query positions again"""
+    client = tda.client.Client
+    acct_num = "1234567890"
+    calls = []
+
+    class MockResponse:
+        content = orjson.dumps(POSITIONS)
+
+    def mock_get_account(acct_id, fields):
+        calls.append(acct_id)
+        return MockResponse
+
+    def mock_get_existing_stc_orders(client, option_symbol):
+        return []
+
+    def mock_place_order(acct_num, order_spec):
+        return "PASAR"
+
+    monkeypatch.setattr(client, "get_account", mock_get_account)
+    monkeypatch.setattr(am, "get_existing_stc_orders", mock_get_existing_stc_orders)
+    monkeypatch.setattr(client, "place_order", mock_place_order)
+
+    # positions are cached before the BTO order is placed
+    am.get_position_quant(client, acct_num, "SPY_030321P380")
+    monkeypatch.setitem(VALID_ORD_INPUT, "instruction", "BTO")
+    am.process_bto_order(client, acct_num, VALID_ORD_INPUT, USR_SET)
+
+    monkeypatch.setitem(VALID_ORD_INPUT, "instruction", "STC")
+    am.process_stc_order(client, acct_num, VALID_ORD_INPUT, USR_SET)
+    assert len(calls) == 2
+
+
 def test_get_existing_stc_orders_valid(monkeypatch):
     """Orders containing valid STC orders return order ids """
     # prepare test orders
@@ -584,11 +832,9 @@ def test_get_existing_stc_orders_valid(monkeypatch):
 
     # mock call to API and returned object
     class MockResponse:
-        @staticmethod
-        def json():
-            return orders
+        content = orjson.dumps(orders)
 
-    def mock_get_orders_by_query(from_entered_datetime, statuses):
+    def mock_get_orders_by_query(from_entered_datetime, status):
         return MockResponse
 
     client = tda.client.Client
@@ -617,11 +863,53 @@ def test_get_existing_stc_orders_invalid(monkeypatch):
 
     # mock call to API and returned object
     class MockResponse:
-        @staticmethod
-        def json():
-            return orders
+        content = orjson.dumps(orders)
+
+    def mock_get_orders_by_query(from_entered_datetime, status):
+        return MockResponse
+
+    client = tda.client.Client
+    symbol = "TSLA_030521P520"
+    monkeypatch.setattr(client, "get_orders_by_query", mock_get_orders_by_query)
+    assert am.get_existing_stc_orders(client, symbol) == []
+
+
+def test_get_existing_stc_orders_queries_each_status(monkeypatch):
+    """Each status should be queried separately and duplicate orders removed"""
+    order = copy.deepcopy(ORDERS)
+    order["orderLegCollection"][0]["instruction"] = "SELL_TO_CLOSE"
+    order["status"] = "WORKING"
+    queried = []
+
+    class MockResponse:
+        content = orjson.dumps([order])
+
+    def mock_get_orders_by_query(from_entered_datetime, status):
+        queried.append(status)
+        return MockResponse
+
+    client = tda.client.Client
+    symbol = "TSLA_030521P520"
+    monkeypatch.setattr(client, "get_orders_by_query", mock_get_orders_by_query)
+    assert am.get_existing_stc_orders(client, symbol) == ["1234567890"]
+    assert len(queried) == 4
+    assert set(queried) == {
+        tda.client.Client.Order.Status.FILLED,
+        tda.client.Client.Order.Status.QUEUED,
+        tda.client.Client.Order.Status.ACCEPTED,
+        tda.client.Client.Order.Status.WORKING,
+    }
+
+
+def test_get_existing_stc_orders_trigger_no_child(monkeypatch):
+    """Trigger orders without child orders should be skipped"""
+    order = copy.deepcopy(ORDERS)
+    del order["childOrderStrategies"]
+
+    class MockResponse:
+        content = orjson.dumps([order])
 
-    def mock_get_orders_by_query(from_entered_datetime, statuses):
+    def mock_get_orders_by_query(from_entered_datetime, status):
         return MockResponse
 
     client = tda.client.Client
@@ -0,0 +1,49 @@
+"""Tests for backtest_calcs.py"""
+import pytest
+import src.ameritrade_orders as am
+
+np = pytest.importorskip("numpy")
+bc = pytest.importorskip("src.backtest_calcs")
+
+PRICES = np.array([0.45, 1.0, 2.0, 3.35, 12.5, 120.0])
+PERCENTS = np.array([0.0, 0.03, 0.1, 0.25, 0.405, 0.75])
+
+
+def test_calc_buy_order_quantity_vec():
+    """Should match scalar buy order quantities"""
+    ord_val = 2000.0
+    vec = bc.calc_buy_order_quantity_vec(PRICES, ord_val, PERCENTS)
+    for i in range(len(PRICES)):
+        assert vec[i] == am.calc_buy_order_quantity(PRICES[i], ord_val, PERCENTS[i])
+
+
+def test_calc_buy_limit_price_vec():
+    """Should match scalar buy limit prices"""
+    vec = bc.calc_buy_limit_price_vec(PRICES, PERCENTS)
+    for i in range(len(PRICES)):
+        assert vec[i] == am.calc_buy_limit_price(PRICES[i], PERCENTS[i])
+
+
+def test_calc_sl_percentage_vec():
+    """Should match scalar stop loss percentages"""
+    sl_prices = PRICES * 0.8
+    vec = bc.calc_sl_percentage_vec(PRICES, sl_prices)
+    for i in range(len(PRICES)):
+        assert vec[i] == pytest.approx(am.calc_sl_percentage(PRICES[i], sl_prices[i]))
+
+
+def test_calc_sl_price_vec():
+    """Should match scalar stop loss prices"""
+    vec = bc.calc_sl_price_vec(PRICES, PERCENTS)
+    for i in range(len(PRICES)):
+        assert vec[i] == am.calc_sl_price(PRICES[i], PERCENTS[i])
+
+
+def test_calc_position_reduction_vec():
+    """Should match scalar sell / keep split"""
+    pos_qty = np.array([1.0, 5.0, 10.0, 10.0])
+    percent = np.array([0.10, 0.405, 0.50, 0.75])
+    sell_qty, keep_qty = bc.calc_position_reduction_vec(pos_qty, percent)
+    for i in range(len(pos_qty)):
+        expected = am.calc_position_reduction(pos_qty[i], percent[i])
+        assert (sell_qty[i], keep_qty[i]) == expected
@@ -3,10 +3,16 @@
 import sys
 import tda
 import tda.orders.options
-import json
+import orjson
 import logging
 import datetime
+import concurrent.futures
+import functools
+import itertools
 import math
+import os
+import time
+from http import HTTPStatus
 import src.validate_params as vp
 from src.client_settings import (
     TD_TOKEN_PATH,
@@ -22,20 +28,50 @@ from src.client_settings import (
 )
 
 
+# order statuses for orders that are still in effect
+_ACTIVE_STATUSES = frozenset({"WORKING", "QUEUED", "ACCEPTED"})
+
+# account id -> (time retrieved, {symbol: long quantity})
+_positions_cache = {}
+
+
+class AuthenticationExpired(Exception):
+    """Raised when TDA responds that the client is no longer authenticated"""
+
+
 def initialize_order(ord_params):
-    """Initialize TDA and order related values,
-    authenticate with TDA site and place order"""
+    """Get authenticated TDA client and user settings, then place order"""
+    client, td_acct, usr_set = get_client()
+
+    # generate and place order
+    try:
+        if ord_params["instruction"] == "BTO":
+            process_bto_order(client, td_acct["acct_num"], ord_params, usr_set)
+        elif ord_params["instruction"] == "STC":
+            process_stc_order(client, td_acct["acct_num"], ord_params, usr_set)
+        else:
+            instr = ord_params["instruction"]
+            logging.warning(f"Invalid order instruction: {instr}")
+    except AuthenticationExpired:
+        # cached client was cleared, the next order will re-authenticate
+        logging.warning(
+            f"TDA authentication expired, order not processed: {ord_params}"
+        )
+
+
+def get_client():
+    """Initialize TDA and order related values and authenticate with TDA site.
+    Returns (client, td_acct, usr_set). The authenticated client is cached and
+    reused across orders"""
 
     # initialize values
     td_acct = {}
-    with open(TD_AUTH_PARAMS_PATH) as fp:
-        td_auth_params = json.load(fp)
+    td_auth_params = load_config(TD_AUTH_PARAMS_PATH)
     td_acct["uri"] = td_auth_params[TD_DICT_KEY_URI]
     td_acct["api_key"] = td_auth_params[TD_DICT_KEY_API]
     td_acct["acct_num"] = td_auth_params[TD_DICT_KEY_ACCT]
 
-    with open(ORD_SETTINGS_PATH) as fp:
-        order_settings = json.load(fp)
+    order_settings = load_config(ORD_SETTINGS_PATH)
     # max_ord_val is max $ value of order e.g. 500.00
     # high_risk_ord_value is the order value for higher risk orders
     usr_set = {
@@ -50,18 +86,23 @@ def initialize_order(ord_params):
 
     # authenticate
     client = authenticate_tda_account(TD_TOKEN_PATH, td_acct["api_key"], td_acct["uri"])
+    return client, td_acct, usr_set
 
-    # generate and place order
-    if ord_params["instruction"] == "BTO":
-        process_bto_order(client, td_acct["acct_num"], ord_params, usr_set)
-    elif ord_params["instruction"] == "STC":
-        process_stc_order(client, td_acct["acct_num"], ord_params, usr_set)
-    else:
-        instr = ord_params["instruction"]
-        logging.warning(f"Invalid order instruction: {instr}")
+
+def load_config(path: str):
+    """Returns parsed JSON config file. File is only re-read if it has been modified"""
+    return _load_config(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_config(path: str, mtime_ns: int):
+    with open(path, "rb") as fp:
+        return orjson.loads(fp.read())
 
 
 # creating more than one client will likely cause issues with authentication
+# client is cached so its session (and open connections) are reused across orders
+@functools.lru_cache(maxsize=1)
 def authenticate_tda_account(token_path: str, api_key: str, redirect_uri: str):
     """Takes path to locally stored auth token, TDA app key, and redirect uri then tries
     to authenticate. If unable to authenticate with token, performs backup
@@ -87,17 +128,38 @@ def authenticate_tda_account(token_path: str, api_key: str, redirect_uri: str):
 def build_option_symbol(ord_params: dict):
     """ Returns option symbol as string from order parameters dictionary.
     Note that expiration_date must be datetime.datetime object"""
+    return _build_option_symbol(
+        ord_params["ticker"],
+        ord_params["expiration"],  # datetime.datetime obj
+        ord_params["contract_type"],
+        ord_params["strike_price"],
+    )
+
+
+# alerts often repeat the same contract (stop adjustments, partial closes)
+@functools.lru_cache(maxsize=4096)
+def _build_option_symbol(ticker, expiration, contract_type, strike_price):
     symbol_builder_class = tda.orders.options.OptionSymbol(
-        underlying_symbol=ord_params["ticker"],
-        expiration_date=ord_params["expiration"],  # datetime.datetime obj
-        contract_type=ord_params["contract_type"],
-        strike_price_as_string=ord_params["strike_price"],
+        underlying_symbol=ticker,
+        expiration_date=expiration,
+        contract_type=contract_type,
+        strike_price_as_string=strike_price,
     )
     # OptionSymbol class does not return symbol until build method is called
     symbol = symbol_builder_class.build()
     return symbol
 
 
+def check_auth(response):
+    """Returns the response. If the response shows that authentication has expired,
+    clears the cached client so the next order re-authenticates and raises
+    AuthenticationExpired to stop processing the current order"""
+    if getattr(response, "status_code", None) == HTTPStatus.UNAUTHORIZED:
+        authenticate_tda_account.cache_clear()
+        raise AuthenticationExpired(response)
+    return response
+
+
 def output_response(ord_params: dict, response):
     """Logs non-json response and sends it to std.out"""
     logging.info(ord_params)
@@ -109,35 +171,36 @@ def output_response(ord_params: dict, response):
 # BTO-related functions
 def process_bto_order(client, acct_num: str, ord_params: dict, usr_set: dict):
     """Prepare and place BTO order"""
+    price = ord_params["contract_price"]
+    flags = ord_params["flags"]
+    usr_sl_percent = usr_set["SL_percent"]
+    limit_factor = 1 + usr_set["buy_limit_percent"]
+
     # determine risk level and corresponding order size
-    if ord_params["flags"]["risk_level"] == "high risk":
+    if flags["risk_level"] == "high risk":
         order_value = usr_set["high_risk_ord_val"]
     else:
         order_value = usr_set["max_ord_val"]
     # determine purchase quantity
-    buy_qty = calc_buy_order_quantity(
-        ord_params["contract_price"], order_value, usr_set["buy_limit_percent"],
-    )
+    buy_qty = calc_buy_order_quantity_precomputed(price, order_value, limit_factor)
     if buy_qty >= 1:
         option_symbol = build_option_symbol(ord_params)
 
         # Use more conservative SL if there are two
-        sl_percent = usr_set["SL_percent"]
-        if ord_params["flags"]["SL"] is not None:
-            rec_sl = float(ord_params["flags"]["SL"])
-            rec_sl_percent = calc_sl_percentage(ord_params["contract_price"], rec_sl)
-            if rec_sl_percent < usr_set["SL_percent"]:
+        sl_percent = usr_sl_percent
+        if flags["SL"] is not None:
+            rec_sl_percent = calc_sl_percentage(price, float(flags["SL"]))
+            if rec_sl_percent < usr_sl_percent:
                 sl_percent = rec_sl_percent
-        sl_price = calc_sl_price(ord_params["contract_price"], sl_percent)
-        buy_lim_price = calc_buy_limit_price(
-            ord_params["contract_price"], usr_set["buy_limit_percent"]
-        )
+        sl_price = calc_sl_price(price, sl_percent)
+        buy_lim_price = calc_buy_limit_price_precomputed(price, limit_factor)
 
         # prepare buy limit order and accompanying stop loss order
         ota_order = build_bto_order_w_stop_loss(
             option_symbol, buy_qty, buy_lim_price, sl_price
         )
-        response = client.place_order(acct_num, order_spec=ota_order)
+        response = check_auth(client.place_order(acct_num, order_spec=ota_order))
+        _positions_cache.pop(acct_num, None)  # position has changed
         output_response(ord_params, response)
 
     else:
@@ -149,15 +212,29 @@ def process_bto_order(client, acct_num: str, ord_params: dict, usr_set: dict):
 def calc_buy_order_quantity(price: float, ord_val: float, limit_percent: float):
     """Returns the order quantity (int) for a buy order based on
     the option price, maximum order size, and buy limit percent  """
+    return calc_buy_order_quantity_precomputed(price, ord_val, 1 + limit_percent)
+
+
+def calc_buy_order_quantity_precomputed(
+    price: float, ord_val: float, limit_factor: float
+):
+    """Same as calc_buy_order_quantity but takes limit_factor (1 + limit_percent)
+    so callers that already computed it do not repeat the addition"""
     lot_size = 100  # standard lot size value
-    lot_value = price * lot_size * (1 + limit_percent)
+    lot_value = price * lot_size * limit_factor
     quantity = ord_val / lot_value
     return int(quantity)  # int() rounds down
 
 
 def calc_buy_limit_price(contract_price, buy_limit_percent):
     """Returns buy limit price that is buy_limit_percent above the contract price"""
-    return round(contract_price * (1 + buy_limit_percent), 2)
+    return calc_buy_limit_price_precomputed(contract_price, 1 + buy_limit_percent)
+
+
+def calc_buy_limit_price_precomputed(contract_price, limit_factor):
+    """Same as calc_buy_limit_price but takes limit_factor (1 + buy_limit_percent)
+    so callers that already computed it do not repeat the addition"""
+    return round(contract_price * limit_factor, 2)
 
 
 def calc_sl_percentage(contract_price: float, sl_price: float):
@@ -198,9 +275,16 @@ def process_stc_order(client, acct_num: str, ord_params: dict, usr_set: dict):
         # cancel existing STC orders (like stop-markets)
         existing_stc_ids = get_existing_stc_orders(client, option_symbol)
         if len(existing_stc_ids) > 0:
-            for ord_id in existing_stc_ids:
-                response = client.cancel_order(ord_id, acct_num)
-                logging.info(response.content)
+            # cancellations are independent so they are sent concurrently
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(8, len(existing_stc_ids))
+            ) as executor:
+                responses = executor.map(
+                    lambda ord_id: check_auth(client.cancel_order(ord_id, acct_num)),
+                    existing_stc_ids,
+                )
+                for response in responses:
+                    logging.info(response.content)
 
         # if the STC order is meant to reduce the position, sell the suggested %
         # then issue a new STC stop-market for the remainder
@@ -210,7 +294,8 @@ def process_stc_order(client, acct_num: str, ord_params: dict, usr_set: dict):
             )
 
             stc = build_stc_market_order(option_symbol, sell_qty)
-            response_stc = client.place_order(acct_num, order_spec=stc)
+            response_stc = check_auth(client.place_order(acct_num, order_spec=stc))
+            _positions_cache.pop(acct_num, None)  # position has changed
 
             new_sl_price = calc_sl_price(
                 ord_params["contract_price"], usr_set["SL_percent"]
@@ -221,27 +306,41 @@ def process_stc_order(client, acct_num: str, ord_params: dict, usr_set: dict):
                 stc_stop = build_stc_stop_market_order(
                     option_symbol, keep_qty, new_sl_price
                 )
-                response_stop = client.place_order(acct_num, order_spec=stc_stop)
+                response_stop = check_auth(
+                    client.place_order(acct_num, order_spec=stc_stop)
+                )
+                _positions_cache.pop(acct_num, None)
                 output_response(ord_params, response_stop)
 
         # else sell the entire position
         else:
             stc = build_stc_market_order(option_symbol, pos_qty)
-            response = client.place_order(acct_num, order_spec=stc)
+            response = check_auth(client.place_order(acct_num, order_spec=stc))
+            _positions_cache.pop(acct_num, None)  # position has changed
             output_response(ord_params, response)
 
 
-def get_position_quant(client, acct_id: str, symbol: str):
+def get_position_quant(client, acct_id: str, symbol: str, ttl=2.0):
     """Takes client, account_id, and symbol to search for.
-    Returns position long quantity for symbol"""
-    response = client.get_account(
-        acct_id, fields=tda.client.Client.Account.Fields.POSITIONS
-    )
-    summary = response.json()
-    positions = summary["securitiesAccount"]["positions"]
-    for position in positions:
-        if position["instrument"]["symbol"] == symbol:
-            return float(position["longQuantity"])
+    Returns position long quantity for symbol. Positions are cached for ttl seconds
+    so that orders arriving together share one account query"""
+    cached = _positions_cache.get(acct_id)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        pos_by_sym = cached[1]
+    else:
+        response = check_auth(
+            client.get_account(
+                acct_id, fields=tda.client.Client.Account.Fields.POSITIONS
+            )
+        )
+        summary = orjson.loads(response.content)
+        positions = summary["securitiesAccount"]["positions"]
+        pos_by_sym = {
+            position["instrument"]["symbol"]: float(position["longQuantity"])
+            for position in positions
+        }
+        _positions_cache[acct_id] = (time.monotonic(), pos_by_sym)
+    return pos_by_sym.get(symbol)
 
 
 def get_existing_stc_orders(client, symbol: str, hours=32):
@@ -254,38 +353,55 @@ def get_existing_stc_orders(client, symbol: str, hours=32):
         tda.client.Client.Order.Status.QUEUED,
         tda.client.Client.Order.Status.ACCEPTED,
         tda.client.Client.Order.Status.WORKING,
-    )  # waiting for tda patch to implement multi-status check and speed up query time
-
-    response = client.get_orders_by_query(
-        from_entered_datetime=query_start, statuses=None
     )
-    summary = response.json()
-    order_ids = []
-    for order in summary:
+
+    # TDA endpoint currently only filters on a single status
+    # so one query is sent for each status concurrently
+    def query_status(status):
+        response = check_auth(
+            client.get_orders_by_query(from_entered_datetime=query_start, status=status)
+        )
+        return orjson.loads(response.content)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        results = executor.map(query_status, statuses)
+        # remove any order returned by more than one query
+        summary = {
+            order["orderId"]: order for order in itertools.chain.from_iterable(results)
+        }.values()
+
+    return list(_iter_stc_ids(summary, symbol))
+
+
+def _iter_stc_ids(orders, symbol: str):
+    """Yields order ids of in-effect single-leg STC orders (or child orders)
+    for the given symbol"""
+    for order in orders:
         # is the order an in-effect STC order?
         stc_found = check_stc_order(order, symbol)
         if stc_found is not None:
-            order_ids.append(stc_found)
+            yield stc_found
 
         # does the order have a child order that is an in-effect STC order?
-        elif order["orderStrategyType"] == "TRIGGER":  # has a child order
-            # not currently handling conditional orders with more than one child order
-            child = order["childOrderStrategies"][0]
-            child_order_stc = check_stc_order(child, symbol)
-            if child_order_stc is not None:
-                order_ids.append(child_order_stc)
-    return order_ids
+        elif order.get("orderStrategyType") == "TRIGGER":  # has a child order
+            children = order.get("childOrderStrategies")
+            if children:
+                # not currently handling conditional orders with more than one child
+                child_order_stc = check_stc_order(children[0], symbol)
+                if child_order_stc is not None:
+                    yield child_order_stc
 
 
 def check_stc_order(order, symbol):
     """Return order id if order has an in-effect STC order
     for input symbol, else return None"""
-    if order["status"] in ["WORKING", "QUEUED", "ACCEPTED"]:
-        if len(order["orderLegCollection"]) == 1:  # no multi-leg orders
-            instruct = order["orderLegCollection"][0]["instruction"]
-            ord_symbol = order["orderLegCollection"][0]["instrument"]["symbol"]
-            if ord_symbol == symbol and instruct == "SELL_TO_CLOSE":
-                return str(order["orderId"])
+    if order["status"] in _ACTIVE_STATUSES:
+        legs = order["orderLegCollection"]
+        if len(legs) == 1:  # no multi-leg orders
+            leg = legs[0]
+            if leg["instrument"]["symbol"] == symbol:
+                if leg["instruction"] == "SELL_TO_CLOSE":
+                    return str(order["orderId"])
 
 
 def calc_position_reduction(pos_qty: int, percent: float):
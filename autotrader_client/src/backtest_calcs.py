@@ -0,0 +1,51 @@
+"""Vectorized versions of the order calculations in ameritrade_orders.py for
+evaluating many historical signals at once, e.g. backtests and parameter sweeps.
+Inputs are float64 numpy arrays (or scalars that broadcast against them).
+numpy is not part of client_requirements.txt and must be installed separately,
+e.g. from backtest_requirements.txt. numba is optional: functions are compiled
+with it when installed, else run as plain numpy.
+The live order path should keep using the scalar functions"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function uncompiled"""
+        return lambda func: func
+
+
+# fastmath is left off so that rounding matches the scalar functions exactly
+@njit(cache=True)
+def calc_buy_order_quantity_vec(price, ord_val, limit_percent):
+    """Returns array of buy order quantities, see calc_buy_order_quantity"""
+    lot_size = 100.0  # standard lot size value
+    return np.floor(ord_val / (price * lot_size * (1.0 + limit_percent)))
+
+
+@njit(cache=True)
+def calc_buy_limit_price_vec(contract_price, buy_limit_percent):
+    """Returns array of buy limit prices, see calc_buy_limit_price"""
+    return np.round(contract_price * (1.0 + buy_limit_percent), 2)
+
+
+@njit(cache=True)
+def calc_sl_percentage_vec(contract_price, sl_price):
+    """Returns array of stop loss percentages, see calc_sl_percentage"""
+    return (contract_price - sl_price) / contract_price
+
+
+@njit(cache=True)
+def calc_sl_price_vec(contract_price, sl_percent):
+    """Returns array of stop loss prices, see calc_sl_price"""
+    return np.round(contract_price * (1.0 - sl_percent), 2)
+
+
+@njit(cache=True)
+def calc_position_reduction_vec(pos_qty, percent):
+    """Returns arrays of sell / keep quantities, see calc_position_reduction"""
+    sell_qty = np.ceil(pos_qty * percent)
+    keep_qty = pos_qty - sell_qty
+    return sell_qty, keep_qty
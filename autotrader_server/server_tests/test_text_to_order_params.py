@@ -1,5 +1,6 @@
 """ Testing text_to_order_params.py function"""
 import itertools
+import pytest
 import src.text_to_order_params as ttop
 
 
@@ -14,6 +15,56 @@ ORD_PARAMS = {
     "flags": {"SL": None, "risk_level": None, "reduce": None},
 }
 
+# Otherwise valid signal prefixes that are not exactly 'BTO' or 'STC'
+_chars = set("BTObtoSTCstc")  # to remove duplicates
+INVALID_CART_PRODUCT = [
+    x
+    for x in ("".join(x) for x in itertools.product(sorted(_chars), repeat=3))
+    if x != "BTO" and x != "STC"
+]
+
+INVALID_EXPIRATIONS = [
+    "",
+    "/",
+    "/1",
+    "1/",
+    "12/",
+    "/12",
+    "123/1",
+    "1/123",
+    "12/123",
+    "123/12",
+    "123/123",
+    "12/1234",
+    "1234/12",
+    "C/1",
+    "1/C",
+    "1//1",
+]
+INVALID_YEARS = [
+    "/",
+    "/1",
+    "123",
+    "/123",
+    "12345",
+    "/12345",
+    "/AB",
+    "/1A",
+    "/1234A",
+    "/12",
+]
+
+# invalid SL bases with valid prices and valid SL bases with invalid prices
+INVALID_SL_COMMENTS = [
+    base + price
+    for base in ["SL", "@ ", "L@", "L @", "S@", "S @", ""]
+    for price in ["1.45", "1.4", ".4", ".45"]
+] + [
+    base + price
+    for base in ["SL@", "SL@ ", "SL @", "SL @ "]
+    for price in ["1.453", "1234.4", "@ .4", "a.45", "1.45a", ""]
+]
+
 
 def test_ttop_no_signal():
     """String with no signal returns null order"""
@@ -66,10 +117,11 @@ def test_ttop_only_parentheses_comment(monkeypatch):
     assert ttop.text_to_order_params("BTO INTC 50C 12/31 @0.45 (SL @.35)") == ORD_PARAMS
 
 
-def test_ttop_two_valid_signals():
-    """Two valid signals in same message return null"""
+def test_ttop_two_valid_signals(caplog):
+    """Two valid signals in same message return null and log a warning"""
     string = "BTO INTC 50C 12/31 @0.45"
     assert ttop.text_to_order_params(string + " " + string) is None
+    assert caplog.records[-1].name == ttop.__name__
 
 
 def test_ttop_valid_instruction(monkeypatch):
@@ -80,18 +132,11 @@ def test_ttop_valid_instruction(monkeypatch):
         assert ttop.text_to_order_params(valid + " INTC 50C 12/31 @0.45") == ORD_PARAMS
 
 
-def test_ttop_invalid_instructions():
+@pytest.mark.parametrize("combo", INVALID_CART_PRODUCT)
+def test_ttop_invalid_instructions(combo):
     """Otherwise valid signal with prefix that is
     not exactly capitalized 'BTO' or 'STC' returns null"""
-    valid_instructions = ["BTO", "STC"]
-    letters = []
-    for instruction in valid_instructions:
-        letters.extend(list(instruction.upper() + instruction.lower()))
-    chars = set(letters)  # to remove duplicates
-    cart_product = ["".join(x) for x in itertools.product(chars, repeat=3)]
-    invalid_cart_product = [x for x in cart_product if x != "BTO" and x != "STC"]
-    for combo in invalid_cart_product:
-        assert ttop.text_to_order_params(combo + " INTC 50C 12/31 @.45") is None
+    assert ttop.text_to_order_params(combo + " INTC 50C 12/31 @.45") is None
 
 
 def test_ttop_instruction_with_extra_char():
@@ -242,47 +287,15 @@ def test_ttop_valid_expiration(monkeypatch):
             )
 
 
-def test_ttop_invalid_expiration():
+@pytest.mark.parametrize("expiration", INVALID_EXPIRATIONS)
+@pytest.mark.parametrize("year", INVALID_YEARS)
+def test_ttop_invalid_expiration(expiration, year):
     """# Invalid expiration, not containing  1-2 digits/1-2 digits
     then optionally /2 or 4 digits returns null"""
-    invalid_expiration = [
-        "",
-        "/",
-        "/1",
-        "1/",
-        "12/",
-        "/12",
-        "123/1",
-        "1/123",
-        "12/123",
-        "123/12",
-        "123/123",
-        "12/1234",
-        "1234/12",
-        "C/1",
-        "1/C",
-        "1//1",
-    ]
-    invalid_years = [
-        "/",
-        "/1",
-        "123",
-        "/123",
-        "12345",
-        "/12345",
-        "/AB",
-        "/1A",
-        "/1234A",
-        "/12",
-    ]
-    for expiration in invalid_expiration:
-        for year in invalid_years:
-            assert (
-                ttop.text_to_order_params(
-                    "BTO INTC 50C " + expiration + year + " @0.45"
-                )
-                is None
-            )
+    assert (
+        ttop.text_to_order_params("BTO INTC 50C " + expiration + year + " @0.45")
+        is None
+    )
 
 
 def test_ttop_correct_at_syntax():
@@ -412,21 +425,10 @@ def test_parse_sl_valid():
             assert ttop.parse_sl(comment2) == price
 
 
-def test_parse_sl_invalid():
+@pytest.mark.parametrize("comment", INVALID_SL_COMMENTS)
+def test_parse_sl_invalid(comment):
     """Text with no valid SL instruction returns None"""
-    invalid_bases = ["SL", "@ ", "L@", "L @", "S@", "S @", ""]
-    prices = ["1.45", "1.4", ".4", ".45"]
-    for base in invalid_bases:
-        for price in prices:
-            comment = base + price
-            assert ttop.parse_sl(comment) is None
-
-    bases = ["SL@", "SL@ ", "SL @", "SL @ "]
-    invalid_prices = ["1.453", "1234.4", "@ .4", "a.45", "1.45a", ""]
-    for base in bases:
-        for price in invalid_prices:
-            comment = base + price
-            assert ttop.parse_sl(comment) is None
+    assert ttop.parse_sl(comment) is None
 
 
 def test_parse_risk_valid():
@@ -459,6 +461,19 @@ def test_parse_risk_invalid():
         assert ttop.parse_risk(term) is None
 
 
+def test_parse_bto_comments():
+    """SL and risk level are both parsed from the same comments"""
+    assert ttop.parse_bto_comments("") == (None, None)
+    assert ttop.parse_bto_comments("(SL @.35)") == (".35", None)
+    assert ttop.parse_bto_comments("(Risky Daytrade)") == (None, "high risk")
+    assert ttop.parse_bto_comments("(Risky SL @.35)") == (".35", "high risk")
+    assert ttop.parse_bto_comments("SL @.35 light position SL @.25") == (
+        ".35",
+        "high risk",
+    )
+    assert ttop.parse_bto_comments("sl @.35") == (None, None)
+
+
 def test_parse_reduce_valid():
     """Correct patterns return XX% """
     terms = ["closing", "trim"]
@@ -485,3 +500,4 @@ def test_strip_markdown():
     """Should remove underscores and asterisks"""
     test_str = "***___***te*_st***___***"
     assert ttop.strip_markdown(test_str) == "test"
+    assert ttop.strip_markdown("BTO INTC 50C 12/31 @0.45") == "BTO INTC 50C 12/31 @0.45"
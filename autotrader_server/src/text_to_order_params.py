@@ -2,39 +2,39 @@
 import logging
 import re
 
+logger = logging.getLogger(__name__)
 
-def text_to_order_params(string: str):
-    """ Parses string for signal. If string contains one and only one order signal,
-    then it returns the order parameters as strings and any additional comments,
-    else returns None
-    Format example:
-        'STC INTC 50C 12/31 @.45'
-        <Open/close> <ticker> <strike price + call or put> <expiration date> <@ price>
-    """
+# translation table that deletes markdown characters
+_MARKDOWN_TABLE = str.maketrans("", "", "*_")
+
+
+def _order_pattern():
+    """Returns regex pattern string for an order signal"""
     # Regex Formatting
     # () denote regex groupings. Regex 'or' uses short-circuit evaluation
     # (?<!\S) is negative lookbehind assertion for any non-whitespace character
     # BTO/STC cannot be preceded by any non-whitespace character
-    instruction = "((?<!\S)BTO|(?<!\S)STC)"
-    ticker_pattern = "([A-Z]{1,5})"  # 1-5 capitalized letters
+    # single lookbehind before the literal alternation lets re scan for the prefixes
+    instruction = r"(?<!\S)(BTO|STC)"
+    ticker_pattern = r"([A-Z]{1,5})"  # 1-5 capitalized letters
 
     # 1-5 numbers with optional two decimals
-    strike_price = "([0-9]{1,5}\.[0-9]{1,2}|[0-9]{1,5})"
-    contract_type = "([CP]{1})"  # either C or P
+    strike_price = r"([0-9]{1,5}\.[0-9]{1,2}|[0-9]{1,5})"
+    contract_type = r"([CP]{1})"  # either C or P
 
     # can be month/day/year(2 or 4 digit year) or month/day
     # month and day can be 1-2 digits
     # regex tries to match patterns from left to right with or ( | ) operator
-    expiration_date = "([0-9]{1,2}/[0-9]{1,2}/[0-9]{4}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{2}|[0-9]{1,2}/[0-9]{1,2})"
+    expiration_date = r"([0-9]{1,2}/[0-9]{1,2}/[0-9]{4}|[0-9]{1,2}/[0-9]{1,2}/[0-9]{2}|[0-9]{1,2}/[0-9]{1,2})"
 
     # (?!\S) is negative lookahead assertion for any non-whitespace
-    # (?=[(]) is positive lookahead assertion for open parentheses
+    # (?=\() is positive lookahead assertion for open parentheses
     # contract price is up to 3 digit number followed by 1-2 decimals
     # and either no non-whitespace or an open parentheses
-    contract_price = "([0-9]{0,3}\.[0-9]{1,2}((?!\S)|(?=[(])))"
-    space = "\s{1,2}"  # 1-2 spaces
-    at = "@\s{0,1}"  # @ followed by 0-1 spaces
-    regex_pattern = (
+    contract_price = r"([0-9]{0,3}\.[0-9]{1,2})(?:(?!\S)|(?=\())"
+    space = r"\s{1,2}"  # 1-2 spaces
+    at = r"@\s{0,1}"  # @ followed by 0-1 spaces
+    return (
         instruction
         + space
         + ticker_pattern
@@ -48,71 +48,101 @@ def text_to_order_params(string: str):
         + contract_price
     )
 
-    # Outputs
-    order_params = {
-        "instruction": None,
-        "ticker": None,
-        "strike_price": None,
-        "contract_type": None,
-        "expiration": None,
-        "contract_price": None,
-        "comments": None,
-        "flags": {"SL": None, "risk_level": None, "reduce": None},
-    }
 
+# patterns are compiled once at import instead of on every call
+_ORDER_RE = re.compile(_order_pattern())
+_SL_PATTERN = (
+    r"(SL\s{0,1}@\s{0,1})" + r"(?P<sl_price>[0-9]{0,3}\.[0-9]{1,2})(?:(?!\S)|(?=\)))"
+)
+_RISK_PATTERN = r"(?<!\w)(?:risky|daytrade|small\sposition|light\sposition)(?!\w)"
+_SL_RE = re.compile(_SL_PATTERN)
+_RISK_RE = re.compile(_RISK_PATTERN, re.IGNORECASE)
+# SL and risk terms in one pass over BTO comments, only risk terms ignore case
+_BTO_COMMENTS_RE = re.compile(
+    r"(?P<sl>" + _SL_PATTERN + r")|(?P<risk>(?i:" + _RISK_PATTERN + r"))"
+)
+_REDUCE_RE = re.compile(r"(?<!\w)(?:closing|trim)\s([0-9]{1,3}%)(?!\w)", re.IGNORECASE)
+
+# bound pattern methods used by the parsing functions below
+_order_search = _ORDER_RE.search
+_sl_search = _SL_RE.search
+_risk_search = _RISK_RE.search
+_bto_comments_finditer = _BTO_COMMENTS_RE.finditer
+_reduce_search = _REDUCE_RE.search
+
+
+def text_to_order_params(string: str):
+    """ Parses string for signal. If string contains one and only one order signal,
+    then it returns the order parameters as strings and any additional comments.
+    Returns None, without building any parameters, if there is no signal or more
+    than one signal
+    Format example:
+        'STC INTC 50C 12/31 @.45'
+        <Open/close> <ticker> <strike price + call or put> <expiration date> <@ price>
+    """
     # strip markdown from text
     clean_string = strip_markdown(string)
 
+    # most messages contain neither instruction, skip the regex for them
+    if "BTO" not in clean_string and "STC" not in clean_string:
+        return None
+
     # Text should contain one and only one order signal
-    matches = [match for match in re.finditer(regex_pattern, clean_string)]
-    if len(matches) == 1:
-        match = matches[0]  # match is re.Match object
-        match.groups()
-        order_params["instruction"] = match.group(1)
-        order_params["ticker"] = match.group(2)
-        order_params["strike_price"] = match.group(3)
-        order_params["contract_type"] = match.group(4)
-        order_params["expiration"] = match.group(5)
-        order_params["contract_price"] = match.group(6)
-        start, end = match.span()
-        comments = clean_string[end:]
-        if comments != "":
-            order_params["comments"] = comments
-            if order_params["instruction"] == "BTO":
-                order_params["flags"]["SL"] = parse_sl(order_params["comments"])
-                order_params["flags"]["risk_level"] = parse_risk(
-                    order_params["comments"]
-                )
-            elif order_params["instruction"] == "STC":
-                order_params["flags"]["reduce"] = parse_reduce(order_params["comments"])
-    elif len(matches) > 1:
-        logging.warning("Two or matches detected in string")
-
-    if order_params == {
-        "instruction": None,
-        "ticker": None,
-        "strike_price": None,
-        "contract_type": None,
-        "expiration": None,
-        "contract_price": None,
-        "comments": None,
-        "flags": {"SL": None, "risk_level": None, "reduce": None},
-    }:
+    match = _order_search(clean_string)  # match is re.Match object
+    if match is None:
         return None
-    else:
-        return order_params
+    # a second search from the end of the first match is enough to find duplicates
+    end = match.end()
+    if _order_search(clean_string, end) is not None:
+        logger.warning("Two or more order signals detected in string")
+        return None
+
+    g = match.group  # bound once for the group lookups below
+    instruction = g(1)
+    comments = sl = risk_level = reduce = None
+    if end < len(clean_string):  # only slice when there is text after the signal
+        comments = clean_string[end:]
+        if instruction == "BTO":
+            sl, risk_level = parse_bto_comments(comments)
+        elif instruction == "STC":
+            reduce = parse_reduce(comments)
+
+    # Outputs
+    # kept as a dict since it is uploaded as JSON for the client to validate
+    return {
+        "instruction": instruction,
+        "ticker": g(2),
+        "strike_price": g(3),
+        "contract_type": g(4),
+        "expiration": g(5),
+        "contract_price": g(6),
+        "comments": comments,
+        "flags": {"SL": sl, "risk_level": risk_level, "reduce": reduce},
+    }
+
+
+def parse_bto_comments(comments: str):
+    """Parses BTO comments for both SL and key terms indicating high risk in a
+    single scan. Returns (SL, risk level), see parse_sl and parse_risk"""
+    sl = None
+    risk_level = None
+    for match in _bto_comments_finditer(comments):
+        if match.lastgroup == "sl":
+            if sl is None:  # first SL is used, same as parse_sl
+                sl = match.group("sl_price")
+        else:
+            risk_level = "high risk"
+        if sl is not None and risk_level is not None:
+            break
+    return sl, risk_level
 
 
 def parse_sl(comments: str):
     """Parses comments for SL on an order"""
     parsed = None
-    sl_at = "(SL\s{0,1}@\s{0,1})"
-    sl_price = "([0-9]{0,3}\.[0-9]{1,2}((?!\S)|(?=[)])))"
-    pattern = sl_at + sl_price
-    match = re.search(pattern, comments)
+    match = _sl_search(comments)
     if match:
-        match.groups()
-        parsed = match.group(2)
+        parsed = match.group("sl_price")
     return parsed
 
 
@@ -120,27 +150,17 @@ def parse_risk(comments: str):
     """Parses tests for key terms indicating high risk. Returns "high risk" if terms are
     found, else returns None. Key terms must not have alphanumeric character before or
     after term"""
-    parsed = None
-    pattern = "(?<!\w)((risky)|(daytrade)|(small\sposition)|(light\sposition))(?!\w)"
-    match = re.search(pattern, comments, flags=re.IGNORECASE)
-    if match:
-        parsed = "high risk"
-    return parsed
+    return "high risk" if _risk_search(comments) else None
 
 
 def parse_reduce(comments: str):
     """Parses text for signal to reduce position by XX%.
     Returns XX% as a string if found, else returns None"""
-    parsed = None
-    pattern = "(?<!\w)(closing|trim)(\s)([0-9]{1,3}%)(?!\w)"
-    match = re.search(pattern, comments, flags=re.IGNORECASE)
-    if match:
-        parsed = match.group(3)
-    return parsed
+    return match.group(1) if (match := _reduce_search(comments)) else None
 
 
 def strip_markdown(string: str):
     """Removes underscores and asterisks"""
-    clean_str = string.replace("*", "")
-    clean_str = clean_str.replace("_", "")
-    return clean_str
+    if "*" in string or "_" in string:
+        return string.translate(_MARKDOWN_TABLE)
+    return string  # no copy needed for text without markdown